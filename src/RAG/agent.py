@@ -1,6 +1,24 @@
+import re
+import numpy as np
+
+TOP_N = 5
+_BED_RE = re.compile(r"(\d+)\s*bed")
+_PRICE_RE = re.compile(r"under\s*£?([0-9,]+)k?")
+_BOROUGHS = ("camden", "westminster", "hackney", "lambeth", "greenwich", "islington")
+# compiled once at import; one search() call replaces the per-borough loop
+_BOROUGH_RE = re.compile("|".join(map(re.escape, _BOROUGHS)))
+
+
 class SimpleAgent:
     def __init__(self, rag):
         self.rag = rag
+        # filters run on these column views; the frame itself is never copied
+        self.df = df = rag.df
+        boroughs = df["borough"].astype("category").cat
+        self._borough_codes = boroughs.codes.to_numpy()
+        self._borough_cats = boroughs.categories.astype(str).str.lower()
+        self._bedrooms = df["bedrooms"].to_numpy()
+        self._price = df["price"].to_numpy()
 
     def clarify(self, q: str) -> str:
         if "cheap" in q.lower():
@@ -10,14 +28,13 @@ class SimpleAgent:
     def plan(self, clarified: str):
         plan = {"filters": {}, "tool": "filter"}
         q = clarified.lower()
-        import re
-        m = re.search(r"(\d+)\s*bed", q)
+        m = _BED_RE.search(q)
         if m:
             plan["filters"]["bedrooms"] = int(m.group(1))
-        for b in ["camden", "westminster", "hackney", "lambeth", "greenwich", "islington"]:
-            if b in q:
-                plan["filters"]["borough"] = b.title()
-        m2 = re.search(r"under\s*£?([0-9,]+)k?", q)
+        mb = _BOROUGH_RE.search(q)
+        if mb:
+            plan["filters"]["borough"] = mb.group(0).title()
+        m2 = _PRICE_RE.search(q)
         if m2:
             val = int(m2.group(1).replace(",", ""))
             if "k" in q:
@@ -26,15 +43,23 @@ class SimpleAgent:
         return plan
 
     def execute(self, plan):
-        df = self.rag.df.copy()
         f = plan["filters"]
+        mask = np.ones(len(self._price), dtype=bool)
         if "borough" in f:
-            df = df[df["borough"].str.contains(f["borough"], case=False, na=False)]
+            # match against the few categories, then broadcast to rows by code (-1 = missing)
+            hits = np.asarray(self._borough_cats.str.contains(f["borough"].lower(), regex=False), dtype=bool)
+            mask &= np.append(hits, False)[self._borough_codes]
         if "bedrooms" in f:
-            df = df[df["bedrooms"] == f["bedrooms"]]
+            mask &= self._bedrooms == f["bedrooms"]
         if "max_price" in f:
-            df = df[df["price"] <= f["max_price"]]
-        return df.sort_values("price").head(5).to_dict(orient="records")
+            mask &= self._price <= f["max_price"]
+        rows = np.flatnonzero(mask)
+        prices = self._price[rows]
+        if len(rows) > TOP_N:
+            top = np.argpartition(prices, TOP_N)[:TOP_N]
+            rows, prices = rows[top], prices[top]
+        rows = rows[np.argsort(prices, kind="stable")]
+        return self.df.iloc[rows].to_dict(orient="records")
 
     def respond(self, results):
         if not results:
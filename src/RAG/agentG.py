@@ -1,8 +1,13 @@
 # src/RAG/langgraph_agent.py
 import os
+import asyncio
+import functools
+import threading
+from typing import TypedDict
 import pandas as pd
 from dotenv import load_dotenv
-from langgraph.graph import Graph
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph, START, END
 from src.RAG.rag_engine import RAGStore
 from src.RAG.utils import load_processed_df
 import google.generativeai as genai
@@ -11,29 +16,37 @@ import google.generativeai as genai
 load_dotenv()
 genai.configure(api_key="your-api-key")
 
-# Initialize RAG store
-rag = RAGStore()
+class AgentState(TypedDict, total=False):
+    question: str
+    clarified: str
+    plan: str
+    retrieved: list
+    answer: str
 
 # -----------------------------
 # Helper: Gemini LLM wrapper
 # -----------------------------
-def gemini_response(prompt: str, model_name="gemini-2.0-flash"):
-    model = genai.GenerativeModel(model_name)
-    response = model.generate_content(prompt)
+@functools.lru_cache(maxsize=4)
+def _get_model(model_name: str):
+    return genai.GenerativeModel(model_name)
+
+async def gemini_response(prompt: str, model_name="gemini-2.0-flash"):
+    model = _get_model(model_name)
+    response = await model.generate_content_async(prompt)
     return response.text.strip() if response and response.text else "No response."
 
 # -----------------------------
 # Node Functions
 # -----------------------------
-def clarify(state: dict):
+async def clarify(state: AgentState):
     """Clarify ambiguous user query"""
     question = state["question"]
     msg = f"Clarify this real estate query: '{question}'. Make it specific and unambiguous."
-    clarified = gemini_response(msg)
+    clarified = await gemini_response(msg)
     print("🧩 Clarified Query:", clarified)
     return {"clarified": clarified}
 
-def plan(state: dict):
+async def plan(state: AgentState):
     """Plan which tool or filter to use"""
     clarified = state["clarified"]
     msg = (
@@ -41,22 +54,25 @@ def plan(state: dict):
         "Decide what to do next: retrieve properties, filter by borough, or compute stats. "
         "Respond in JSON format like: {'tool': 'retrieve', 'filters': {'borough': 'Camden', 'max_price': 500000}}"
     )
-    plan_text = gemini_response(msg)
+    plan_text = await gemini_response(msg)
     print("🧠 Plan:", plan_text)
     return {"plan": plan_text}
 
-def execute(state: dict):
-    """Run retrieval using RAG pipeline"""
+def _retrieve(rag: RAGStore, query: str):
     if rag.df is None:
         df = load_processed_df()
         rag.build_index(df)
+    return rag.query(query, k=5)
 
-    clarified = state["clarified"]
-    results = rag.query(clarified, k=5)
+async def execute(state: AgentState, config: RunnableConfig):
+    """Run retrieval using RAG pipeline"""
+    rag = config["configurable"]["rag"]
+    # CPU-bound embedding + search; keep it off the event loop so plan can run alongside
+    results = await asyncio.to_thread(_retrieve, rag, state["clarified"])
     print(f"🔍 Retrieved {len(results)} results")
     return {"retrieved": results}
 
-def respond(state: dict):
+async def respond(state: AgentState):
     """Generate final natural answer"""
     retrieved = state["retrieved"]
     context = "\n".join([r["snippet"] for r in retrieved])
@@ -71,7 +87,7 @@ def respond(state: dict):
 
     Based on the above context, provide a detailed, factual answer including property IDs and prices.
     """
-    answer = gemini_response(msg, model_name="gemini-1.5-pro")
+    answer = await gemini_response(msg, model_name="gemini-1.5-pro")
     print("💬 Final Answer:", answer)
     return {"answer": answer}
 
@@ -79,25 +95,49 @@ def respond(state: dict):
 # Graph Definition
 # -----------------------------
 def build_agent_graph():
-    graph = Graph()
+    graph = StateGraph(AgentState)
     graph.add_node("clarify", clarify)
     graph.add_node("plan", plan)
     graph.add_node("execute", execute)
     graph.add_node("respond", respond)
 
+    # plan and execute both only need the clarified query, so they fan out in parallel
+    graph.add_edge(START, "clarify")
     graph.add_edge("clarify", "plan")
-    graph.add_edge("plan", "execute")
-    graph.add_edge("execute", "respond")
+    graph.add_edge("clarify", "execute")
+    graph.add_edge(["plan", "execute"], "respond")
+    graph.add_edge("respond", END)
+    return graph.compile()
 
-    graph.set_entry_point("clarify")
-    graph.set_finish_point("respond")
-    return graph
+_GRAPH = None
+
+def _graph():
+    """Compile the graph once; it holds no per-request state."""
+    global _GRAPH
+    if _GRAPH is None:
+        _GRAPH = build_agent_graph()
+    return _GRAPH
 
 # -----------------------------
 # Agent Runner
 # -----------------------------
-def run_agent(question: str):
-    graph = build_agent_graph()
+async def arun_agent(question: str, rag: RAGStore):
+    graph = _graph()
     state = {"question": question}
-    final_state = graph.run(state)
+    final_state = await graph.ainvoke(state, config={"configurable": {"rag": rag}})
     return final_state
+
+_LOOP = None
+_LOOP_LOCK = threading.Lock()
+
+def _loop():
+    """One long-lived loop: genai caches a gRPC-aio client bound to the first loop it runs on."""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name="agent-loop", daemon=True).start()
+    return _LOOP
+
+def run_agent(question: str, rag: RAGStore):
+    return asyncio.run_coroutine_threadsafe(arun_agent(question, rag), _loop()).result()
@@ -1,59 +1,268 @@
 import os
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
 import faiss
 import pickle
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
+try:
+    import cupy
+    from cuvs.neighbors import cagra
+except ImportError:  # GPU search is optional; FAISS on CPU is used instead
+    cupy = cagra = None
+
+# Below this many rows an exhaustive scan is cheaper than walking a graph
+HNSW_MIN_ROWS = 2000
+# IVF-PQ needs enough vectors to train 64 lists and 256-centroid codebooks
+IVFPQ_MIN_ROWS = 10000
+IVF_NPROBE = 8
+# Semantic query cache: near-duplicate questions reuse earlier results
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_THRESHOLD = 0.97
+ENCODE_BATCH_SIZE = 256
+
+
 class RAGStore:
-    def __init__(self, embed_model="sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(self, embed_model="sentence-transformers/all-MiniLM-L6-v2", index_type="hnsw"):
+        self.embed_model = embed_model
         self.model = SentenceTransformer(embed_model)
+        # pick device and precision once, so every encode (warm-up included) matches
+        if torch.cuda.is_available():
+            self.model = self.model.to("cuda").half()
+        self.index_type = index_type
         self.index = None
-        self.texts = []
-        self.metas = []
+        self._use_cagra = cagra is not None
+        self._cagra_index = None
+        self._cagra_ready = False
+        self._cagra_lock = threading.Lock()
+        self.texts = np.array([], dtype=object)
+        self._pids = np.array([], dtype=str)
+        self._rows = np.array([], dtype=np.int64)
         self.df = None
         self.data_dir = "./data"
         os.makedirs(self.data_dir, exist_ok=True)
         self.faiss_path = os.path.join(self.data_dir, "faiss.index")
-        self.meta_path = os.path.join(self.data_dir, "faiss_meta.pkl")
-        self.embeddings_path = os.path.join(self.data_dir, "embeddings.npy")
+        self.meta_path = os.path.join(self.data_dir, "faiss_meta.npz")
+        self.legacy_meta_path = os.path.join(self.data_dir, "faiss_meta.pkl")
+        self.emb_cache_path = os.path.join(self.data_dir, "embcache.npz")
+        self._encode_query = functools.lru_cache(maxsize=QUERY_CACHE_SIZE)(self._encode_query_uncached)
+        # /rag/query runs in FastAPI's threadpool against one shared store
+        self._qcache_lock = threading.Lock()
+        self._reset_query_cache()
+
+    def _encode_query_uncached(self, q):
+        q_emb = self.model.encode([q], convert_to_numpy=True).astype(np.float32)
+        faiss.normalize_L2(q_emb)
+        return q_emb
+
+    def _reset_query_cache(self):
+        dim = self.model.get_sentence_embedding_dimension()
+        with self._qcache_lock:
+            self._qcache_index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+            self._qcache_results = OrderedDict()
+            self._qcache_next_id = 0
+
+    def _cached_query(self, q_emb, k):
+        with self._qcache_lock:
+            if self._qcache_index.ntotal == 0:
+                return None
+            S, I = self._qcache_index.search(q_emb, 1)
+            qid = int(I[0][0])
+            if S[0][0] < QUERY_CACHE_THRESHOLD or qid not in self._qcache_results:
+                return None
+            cached_k, results = self._qcache_results[qid]
+            if cached_k < k:
+                return None
+            self._qcache_results.move_to_end(qid)
+            return results[:k]
+
+    def _cache_query(self, q_emb, k, results):
+        with self._qcache_lock:
+            qid = self._qcache_next_id
+            self._qcache_next_id += 1
+            self._qcache_index.add_with_ids(q_emb, np.array([qid], dtype=np.int64))
+            self._qcache_results[qid] = (k, results)
+            if len(self._qcache_results) > QUERY_CACHE_SIZE:
+                old_id, _ = self._qcache_results.popitem(last=False)
+                self._qcache_index.remove_ids(np.array([old_id], dtype=np.int64))
 
     def build_index(self, df):
         self.df = df
-        docs, metas = [], []
-        for i, r in df.iterrows():
-            text = f"{r['property_id']} | {r['address']} | {r['borough']} | {r['bedrooms']} bed | £{r['price']}"
-            docs.append(text)
-            metas.append({"pid": r["property_id"], "row": i})
-        emb = self.model.encode(docs, convert_to_numpy=True, show_progress_bar=True)
-        np.save(self.embeddings_path, emb)
-        idx = faiss.IndexFlatL2(emb.shape[1])
-        idx.add(emb.astype(np.float32))
-        self.index, self.texts, self.metas = idx, docs, metas
+        cols = {c: df[c].astype(str).fillna("nan") for c in ("property_id", "address", "borough", "bedrooms", "price")}
+        docs = (
+            cols["property_id"] + " | " + cols["address"] + " | " + cols["borough"] + " | "
+            + cols["bedrooms"] + " bed | £" + cols["price"]
+        ).tolist()
+        emb = self._encode_docs(docs)
+        idx = self._new_index(emb.shape[1], len(df))
+        if not idx.is_trained:
+            idx.train(emb)
+        idx.add(emb)
+        self.index = idx
+        self.texts = np.array(docs, dtype=object)
+        self._reset_cagra()
+        self._pids = cols["property_id"].to_numpy(dtype=str)
+        self._rows = np.arange(len(df), dtype=np.int64)
+        self._reset_query_cache()
         faiss.write_index(idx, self.faiss_path)
-        with open(self.meta_path, "wb") as f:
-            pickle.dump({"texts": docs, "metas": metas}, f)
+        np.savez(self.meta_path, texts=self.texts.astype(str), pids=self._pids, rows=self._rows)
         return {"count": len(docs)}
 
+    def _encode_docs(self, docs):
+        """Encode docs, reusing cached embeddings for unchanged text."""
+        # model name is part of the key so switching models invalidates the cache
+        salt = self.embed_model.encode() + b"\0"
+        keys = np.array([hashlib.sha256(salt + d.encode()).digest() for d in docs], dtype="S32")
+        cached_keys, cached = np.array([], dtype="S32"), {}
+        if os.path.exists(self.emb_cache_path):
+            with np.load(self.emb_cache_path) as cache:
+                cached_keys = cache["keys"]
+                cached = dict(zip(cached_keys.tolist(), cache["emb"]))
+        emb = np.empty((len(docs), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        missing = []
+        for i, key in enumerate(keys.tolist()):
+            if key in cached:
+                emb[i] = cached[key]
+            else:
+                missing.append(i)
+        if missing:
+            emb[missing] = self._encode_texts([docs[i] for i in missing])
+        # the cache doubles as the index's embedding matrix, so keep its rows in index order
+        if not np.array_equal(cached_keys, keys):
+            np.savez(self.emb_cache_path, keys=keys, emb=emb)
+        return emb
+
+    def _encode_texts(self, docs):
+        """Encode in length-sorted batches to cut padding, returned in input order."""
+        # Length buckets keep batches similarly padded; the inverse scatter below
+        # restores row order so embeddings still line up with pids/texts.
+        lens = np.fromiter(map(len, docs), dtype=np.int64, count=len(docs))
+        order = np.argsort(lens, kind="stable")
+        emb_sorted = self.model.encode(
+            [docs[i] for i in order],
+            batch_size=ENCODE_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=True,
+        )
+        emb = np.empty_like(emb_sorted, dtype=np.float32)
+        emb[order] = emb_sorted
+        return emb
+
+    def _new_index(self, dim, n_rows):
+        """int8-quantized index: HNSW or IVF-PQ for large corpora, flat scan for small ones."""
+        if self.index_type == "flat":
+            return faiss.IndexFlatL2(dim)
+        if self.index_type == "ivfpq" and n_rows >= IVFPQ_MIN_ROWS:
+            quantizer = faiss.IndexFlatL2(dim)
+            return faiss.IndexIVFPQ(quantizer, dim, 64, 32, 8)
+        if self.index_type in ("hnsw", "ivfpq") and n_rows >= HNSW_MIN_ROWS:
+            idx = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, 32)
+            idx.hnsw.efConstruction = 200
+            return idx
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+
+    def _search_params(self, k):
+        """Per-call search knobs; the shared index itself is never mutated."""
+        if hasattr(self.index, "hnsw"):
+            return faiss.SearchParametersHNSW(efSearch=max(k * 4, 64))
+        if hasattr(self.index, "nprobe"):
+            return faiss.SearchParametersIVF(nprobe=IVF_NPROBE)
+        return None
+
+    def _reset_cagra(self):
+        with self._cagra_lock:
+            self._cagra_index = None
+            self._cagra_ready = False
+
+    def _get_cagra(self):
+        """Build the GPU graph on first batch search; None means search with FAISS."""
+        with self._cagra_lock:
+            if not self._cagra_ready:
+                self._cagra_index = self._build_cagra()
+                self._cagra_ready = True
+            return self._cagra_index
+
+    def _build_cagra(self):
+        """GPU graph index for batch search; skipped for small corpora or without cuVS."""
+        if not self._use_cagra or not os.path.exists(self.emb_cache_path):
+            return None
+        with np.load(self.emb_cache_path) as cache:
+            emb = cache["emb"]
+        if len(emb) < HNSW_MIN_ROWS:
+            return None
+        try:
+            return cagra.build(cagra.IndexParams(), cupy.asarray(emb))
+        except Exception as e:  # no visible GPU, device out of memory, ...
+            print("CAGRA build failed, falling back to FAISS:", e)
+            return None
+
     def load_index(self):
         if os.path.exists(self.faiss_path):
-            self.index = faiss.read_index(self.faiss_path)
-            with open(self.meta_path, "rb") as f:
-                meta = pickle.load(f)
-                self.texts, self.metas = meta["texts"], meta["metas"]
+            self.index = self._read_index()
+            if os.path.exists(self.meta_path):
+                with np.load(self.meta_path) as meta:
+                    self.texts, self._pids, self._rows = meta["texts"], meta["pids"], meta["rows"]
+            else:
+                # index built before metadata moved to .npz
+                with open(self.legacy_meta_path, "rb") as f:
+                    meta = pickle.load(f)
+                self.texts = np.array(meta["texts"], dtype=object)
+                self._pids = np.array([m["pid"] for m in meta["metas"]], dtype=str)
+                self._rows = np.array([m["row"] for m in meta["metas"]], dtype=np.int64)
+            self._reset_cagra()
+            self._reset_query_cache()
             return True
         return False
 
+    def _read_index(self):
+        """Memory-map the index where FAISS supports it for this index type."""
+        try:
+            return faiss.read_index(self.faiss_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            return faiss.read_index(self.faiss_path)
+
     def query(self, q, k=5):
         if not self.index:
             raise ValueError("FAISS index not built or loaded.")
-        q_emb = self.model.encode([q], convert_to_numpy=True)
-        D, I = self.index.search(q_emb.astype(np.float32), k)
-        results = []
-        for d, idx in zip(D[0], I[0]):
-            meta = self.metas[idx]
-            results.append({
-                "property_id": meta["pid"],
-                "distance": float(d),
-                "snippet": self.texts[idx]
-            })
+        q_emb = self._encode_query(q)
+        cached = self._cached_query(q_emb, k)
+        if cached is not None:
+            return cached
+        D, I = self.index.search(q_emb, k, params=self._search_params(k))
+        results = self._format_results(D[0], I[0])
+        self._cache_query(q_emb, k, results)
         return results
+
+    def query_batch(self, qs, k=5):
+        """Retrieve top-k for several questions with one encode and one search call."""
+        if not self.index:
+            raise ValueError("FAISS index not built or loaded.")
+        qs = list(qs)
+        if not qs:
+            return []
+        q_emb = self.model.encode(
+            qs, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+        cagra_index = self._get_cagra()
+        if cagra_index is not None:
+            D, I = cagra.search(cagra.SearchParams(), cagra_index, cupy.asarray(q_emb), k)
+            D, I = cupy.asnumpy(cupy.asarray(D)), cupy.asnumpy(cupy.asarray(I))
+        else:
+            D, I = self.index.search(q_emb, k, params=self._search_params(k))
+        return [self._format_results(d, i) for d, i in zip(D, I)]
+
+    def _format_results(self, distances, ids):
+        # FAISS pads with -1 when fewer than k neighbours exist
+        keep = ids >= 0
+        ids = ids[keep]
+        pids = self._pids[ids].tolist()
+        snippets = self.texts[ids].tolist()
+        return [
+            {"property_id": p, "distance": d, "snippet": t}
+            for p, d, t in zip(pids, distances[keep].tolist(), snippets)
+        ]
@@ -1,9 +1,12 @@
 import io
 import pandas as pd
-from src.config import s3, S3_BUCKET
+from src.config import s3, S3_BUCKET, PROCESSED_KEY
 
-def load_processed_df(key="processed/clean_properties.csv"):
-    """Load processed CSV from S3"""
+def load_processed_df(key=PROCESSED_KEY):
+    """Load processed Parquet from S3"""
     obj = s3.get_object(Bucket=S3_BUCKET, Key=key)
-    df = pd.read_csv(io.BytesIO(obj["Body"].read()))
+    df = pd.read_parquet(io.BytesIO(obj["Body"].read()))
+    # low-cardinality text columns: integer codes filter faster and store smaller
+    for col in ("borough", "property_type"):
+        df[col] = df[col].astype("category")
     return df
@@ -19,5 +19,5 @@ GITHUB_RAW_URL = os.getenv("GITHUB_RAW_URL", "https://github.com/Poojitha319/lon
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 INDEX_PATH = os.getenv("INDEX_PATH", "src/data/faiss_index.pkl")
 EMBEDDINGS_PATH = os.getenv("EMBEDDINGS_PATH", "src/data/embeddings.npy")
-PROCESSED_KEY = os.getenv("PROCESSED_KEY", f"{PROCESSED_PREFIX}/clean_properties.csv")
+PROCESSED_KEY = os.getenv("PROCESSED_KEY", f"{PROCESSED_PREFIX}/clean_properties.parquet")
 RAW_KEY = os.getenv("RAW_KEY", f"{RAW_PREFIX}/london_properties.csv")
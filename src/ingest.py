@@ -2,28 +2,32 @@
 import os
 import boto3
 import requests
+from requests.adapters import HTTPAdapter
 from botocore.exceptions import ClientError
 from src.config import S3_BUCKET, RAW_KEY, GITHUB_RAW_URL, AWS_REGION, s3
 
+# shared keep-alive pool so repeated ingests skip the TCP/TLS handshake
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
 
-def fetch_from_github(raw_url: str) -> bytes:
-    resp = requests.get(raw_url, timeout=20)
-    resp.raise_for_status()
-    return resp.content
 
-def upload_to_s3(key: str, content: bytes, content_type="text/csv"):
-    try:
-        s3.put_object(Bucket=S3_BUCKET, Key=key, Body=content, ContentType=content_type)
-        print(f"Uploaded to s3://{S3_BUCKET}/{key}")
-    except ClientError as e:
-        print("S3 upload error:", e)
-        raise
+def stream_to_s3(url: str, key: str, content_type="text/csv"):
+    """Pipe a download straight into S3 without holding the body in memory."""
+    with _SESSION.get(url, stream=True, timeout=20) as resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        try:
+            s3.upload_fileobj(resp.raw, S3_BUCKET, key, ExtraArgs={"ContentType": content_type})
+            print(f"Uploaded to s3://{S3_BUCKET}/{key}")
+        except ClientError as e:
+            print("S3 upload error:", e)
+            raise
 
 def run_ingest():
     if not GITHUB_RAW_URL:
         raise ValueError("GITHUB_RAW_URL not configured in env")
-    csv_bytes = fetch_from_github(GITHUB_RAW_URL)
-    upload_to_s3(RAW_KEY, csv_bytes)
+    stream_to_s3(GITHUB_RAW_URL, RAW_KEY)
 
 if __name__ == "__main__":
     run_ingest()
@@ -7,15 +7,18 @@ Endpoints:
 - GET  /data/sample    → Return sample processed data
 - POST /build-index    → Build RAG embeddings
 - POST /rag/query      → Retrieve top-k relevant properties
+- POST /rag/query_batch → Retrieve top-k for several questions at once
 - POST /agent/run      → Agentic reasoning + answer generation
 - GET  /health         → Health check
 """
-import requests
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Request, Query
 from pydantic import BaseModel
 import pandas as pd
 import os
-import matplotlib.pyplot as plt
+import base64
+import functools
 from fastapi.responses import StreamingResponse
 import boto3
 import io
@@ -23,6 +26,8 @@ from src.config import s3, S3_BUCKET
 from src.RAG.rag_engine import RAGStore
 from src.RAG.agent import SimpleAgent
 from src.RAG.utils import load_processed_df
+from src.process import parse_prices, upload_processed
+from src.ingest import stream_to_s3
 
 
 
@@ -30,13 +35,27 @@ os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 # -------------------------------------------------
 # FastAPI Initialization
 # -------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the embedding model and index once per worker and share it across requests."""
+    app.state.rag = RAGStore()
+    app.state.rag.load_index()
+    app.state.rag.model.encode(["warmup"])
+    app.state.agent = None
+    yield
+
 app = FastAPI(
     title="London Real Estate RAG Chatbot",
     description="AI-driven real estate assistant powered by a Retrieval-Augmented Generation (RAG) pipeline and agentic reasoning.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
-rag = RAGStore()
+def get_rag(request: Request) -> RAGStore:
+    return request.app.state.rag
+
+# boto3/requests are blocking; run them in worker threads, at most 4 S3 transfers at once
+_S3_SEMAPHORE = asyncio.Semaphore(4)
 
 # -------------------------------------------------
 # Data Models
@@ -45,6 +64,10 @@ class QueryRequest(BaseModel):
     question: str
     k: int = 5
 
+class BatchQueryRequest(BaseModel):
+    questions: list[str]
+    k: int = 5
+
 class AgentRequest(BaseModel):
     question: str
 
@@ -59,7 +82,7 @@ def health_check():
 # Data Ingestion (GitHub → S3 /raw)
 # -------------------------------------------------
 @app.post("/ingest")
-def ingest_data(file_url: str):
+async def ingest_data(file_url: str):
     """
     Download a CSV file from GitHub and upload it to S3 (/raw).
     Example:
@@ -69,15 +92,8 @@ def ingest_data(file_url: str):
     """
 
     try:
-        response = requests.get(file_url)
-        response.raise_for_status()
-        csv_bytes = response.content
-        s3.put_object(
-            Bucket=S3_BUCKET,
-            Key="raw/london_properties.csv",
-            Body=csv_bytes,
-            ContentType="text/csv",
-        )
+        async with _S3_SEMAPHORE:
+            await asyncio.to_thread(stream_to_s3, file_url, "raw/london_properties.csv")
         return {"message": "✅ File successfully ingested to S3 /raw"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error ingesting data: {e}")
@@ -85,39 +101,35 @@ def ingest_data(file_url: str):
 # -------------------------------------------------
 # Data Processing (/raw → /processed)
 # -------------------------------------------------
+def _fetch_raw() -> bytes:
+    obj = s3.get_object(Bucket=S3_BUCKET, Key="raw/london_properties.csv")
+    return obj["Body"].read()
+
+def _clean_raw(raw: bytes) -> pd.DataFrame:
+    df = pd.read_csv(io.BytesIO(raw))
+
+    # Basic cleaning rules
+    df = df.dropna(subset=["price", "address", "borough"])
+    df["borough"] = df["borough"].str.title().str.strip()
+    df["property_type"] = df["property_type"].str.title().str.strip()
+    df["postcode"] = df["postcode"].str.replace(" ", "").str.upper()
+    df["price"] = parse_prices(df["price"])
+    df = df.dropna(subset=["price"])
+    return df.sort_values(by=["borough", "price"]).reset_index(drop=True)
+
 @app.post("/process")
-def process_data():
+async def process_data():
     """
     Clean and standardize raw data, then store in S3 /processed.
     """
     try:
-        obj = s3.get_object(Bucket=S3_BUCKET, Key="raw/london_properties.csv")
-        df = pd.read_csv(io.BytesIO(obj["Body"].read()))
-
-        # Basic cleaning rules
-        df = df.dropna(subset=["price", "address", "borough"])
-        df["borough"] = df["borough"].str.title().str.strip()
-        df["property_type"] = df["property_type"].str.title().str.strip()
-        df["postcode"] = df["postcode"].str.replace(" ", "").str.upper()
-
-        def normalize_price(val):
-            if isinstance(val, str):
-                val = val.replace("£", "").replace(",", "").strip().lower()
-                if "k" in val:
-                    val = float(val.replace("k", "")) * 1000
-            return float(val)
-        df["price"] = df["price"].apply(normalize_price)
-        df = df.sort_values(by=["borough", "price"]).reset_index(drop=True)
-
-        # Upload cleaned CSV to S3 /processed
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
-        s3.put_object(
-            Bucket=S3_BUCKET,
-            Key="processed/clean_properties.csv",
-            Body=csv_buffer.getvalue(),
-            ContentType="text/csv",
-        )
+        async with _S3_SEMAPHORE:
+            raw = await asyncio.to_thread(_fetch_raw)
+        df = await asyncio.to_thread(_clean_raw, raw)
+
+        # Upload cleaned Parquet to S3 /processed
+        async with _S3_SEMAPHORE:
+            await asyncio.to_thread(upload_processed, df)
 
         return {"message": "Data cleaned and uploaded to S3 /processed", "rows": len(df)}
     except Exception as e:
@@ -141,7 +153,7 @@ def get_sample_data(limit: int = 5):
 # Build RAG Index
 # -------------------------------------------------
 @app.post("/build-index")
-def build_index():
+def build_index(rag: RAGStore = Depends(get_rag)):
     """
     Build FAISS embedding index from cleaned data in S3 /processed.
     """
@@ -154,42 +166,52 @@ def build_index():
 # -------------------------------------------------
 # Visualization Endpoint
 # -------------------------------------------------
+@functools.lru_cache(maxsize=1)
+def _render_borough_chart(counts: tuple) -> str:
+    """Render the borough bar chart as Base64 PNG; cached on the counts themselves."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    labels, values = zip(*counts) if counts else ((), ())
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.bar(labels, values, color="skyblue")
+    ax.set_title("Number of Properties by Borough", fontsize=14)
+    ax.set_xlabel("Borough")
+    ax.set_ylabel("Count")
+    ax.tick_params(axis="x", labelrotation=90)
+    plt.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
 @app.get("/visualize/boroughs")
-def visualize_properties_by_borough():
+def visualize_properties_by_borough(fmt: str = Query("json", alias="format")):
     """
-    Generate a bar chart showing the number of properties by borough.
-    Returns: Base64 encoded PNG for embedding or previewing.
+    Number of properties by borough.
+    Returns: counts as JSON for client-side charts, or with format=png a
+    Base64 encoded PNG bar chart for embedding or previewing.
     """
     try:
         df = load_processed_df()
         counts = df["borough"].value_counts()
+        if fmt != "png":
+            return {"status": "success", "counts": counts.to_dict()}
 
-        # Plot chart
-        fig, ax = plt.subplots(figsize=(8, 5))
-        counts.plot(kind="bar", color="skyblue", ax=ax)
-        ax.set_title("Number of Properties by Borough", fontsize=14)
-        ax.set_xlabel("Borough")
-        ax.set_ylabel("Count")
-        plt.tight_layout()
-
-        # Convert to Base64
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png")
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.read()).decode("utf-8")
-        plt.close(fig)
-
-        return JSONResponse({
+        img_base64 = _render_borough_chart(tuple(counts.items()))
+        return {
             "status": "success",
             "visualization": "data:image/png;base64," + img_base64
-        })
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Visualization failed: {e}")
 # -------------------------------------------------
 # RAG Query Endpoint
 # -------------------------------------------------
 @app.post("/rag/query")
-def rag_query(req: QueryRequest):
+def rag_query(req: QueryRequest, rag: RAGStore = Depends(get_rag)):
     """
     Retrieve top-k relevant properties using RAG search.
     """
@@ -201,11 +223,24 @@ def rag_query(req: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"RAG query failed: {e}")
 
+@app.post("/rag/query_batch")
+def rag_query_batch(req: BatchQueryRequest, rag: RAGStore = Depends(get_rag)):
+    """
+    Retrieve top-k relevant properties for several questions in one search.
+    """
+    try:
+        if not rag.index:
+            rag.load_index()
+        results = rag.query_batch(req.questions, k=req.k)
+        return [{"query": q, "results": r} for q, r in zip(req.questions, results)]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"RAG batch query failed: {e}")
+
 # -------------------------------------------------
 # Agentic Reasoning Endpoint
 # -------------------------------------------------
 @app.post("/agent/run")
-def agent_run(req: AgentRequest):
+def agent_run(req: AgentRequest, request: Request, rag: RAGStore = Depends(get_rag)):
     """
     Run an agentic decision loop: clarify → plan → execute → respond.
     """
@@ -214,7 +249,10 @@ def agent_run(req: AgentRequest):
             df = load_processed_df()
             rag.df = df
             rag.load_index()
-        agent = SimpleAgent(rag)
+        # reuse the agent's column arrays until the index is rebuilt on a new frame
+        agent = request.app.state.agent
+        if agent is None or agent.df is not rag.df:
+            agent = request.app.state.agent = SimpleAgent(rag)
         result = agent.run(req.question)
         return result
     except Exception as e:
@@ -1,12 +1,17 @@
 # src/process.py
 import io
 import re
+import tempfile
 import boto3
+import numpy as np
 import pandas as pd
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 from src.config import S3_BUCKET, RAW_KEY, PROCESSED_KEY, AWS_REGION, s3
 
-
+_WS_RE = re.compile(r'\s+')
+_K_RE = re.compile(r'^(\d+(?:\.\d+)?)k$')
+_TRANSFER_CONFIG = TransferConfig(multipart_threshold=8 * 1024 * 1024)
 
 
 def download_raw():
@@ -28,14 +33,14 @@ def download_raw():
 def standardize_postcode(pc: str) -> str:
     if not isinstance(pc, str): return ""
     pc = pc.strip().upper()
-    pc = re.sub(r'\s+', ' ', pc)
+    pc = _WS_RE.sub(' ', pc)
     return pc
 
 def parse_price(p):
     if pd.isna(p): return None
     s = str(p).strip().lower().replace(',', '').replace('£', '')
     # handle "k" notation
-    m = re.match(r'^(\d+(?:\.\d+)?)k$', s)
+    m = _K_RE.match(s)
     if m:
         return int(float(m.group(1)) * 1000)
     try:
@@ -43,15 +48,25 @@ def parse_price(p):
     except:
         return None
 
+def parse_prices(prices: pd.Series) -> pd.Series:
+    """Vectorized parse_price: float prices, NaN where unparseable."""
+    s = prices.astype(str).str.strip().str.lower().str.replace(',', '', regex=False).str.replace('£', '', regex=False)
+    s = s.where(prices.notna())
+    is_k = s.str.fullmatch(_K_RE.pattern).fillna(False).astype(bool)
+    num = pd.to_numeric(s.where(~is_k, s.str[:-1]), errors='coerce')
+    num = np.trunc(num.where(~is_k, num * 1000))
+    return num.where(np.isfinite(num))
+
 def clean_df(df: pd.DataFrame) -> pd.DataFrame:
     # key columns: price, address, borough
     df = df.copy()
-    df['price_num'] = df['price'].apply(parse_price)
+    df['price_num'] = parse_prices(df['price'])
     df['borough'] = df['borough'].astype(str).str.title().str.strip()
     df['property_type'] = df['property_type'].astype(str).str.title().str.strip()
     df['postcode'] = df['postcode'].apply(standardize_postcode)
     # drop rows lacking critical info
     df = df.dropna(subset=['price_num', 'address', 'borough'])
+    df['price_num'] = df['price_num'].astype('int64')
     # ensure bedrooms numeric
     df['bedrooms'] = pd.to_numeric(df['bedrooms'], errors='coerce').fillna(0).astype(int)
     # reorder and select columns
@@ -61,8 +76,11 @@ def clean_df(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 def upload_processed(df):
-    out = df.to_csv(index=False).encode('utf-8')
-    s3.put_object(Bucket=S3_BUCKET, Key=PROCESSED_KEY, Body=out, ContentType='text/csv')
+    # spool to disk and let boto3 do a multipart upload instead of holding a second copy in memory
+    with tempfile.TemporaryFile() as fh:
+        df.to_parquet(fh, index=False, compression='snappy')
+        fh.seek(0)
+        s3.upload_fileobj(fh, S3_BUCKET, PROCESSED_KEY, Config=_TRANSFER_CONFIG)
     print("Uploaded processed to s3://{}/{}".format(S3_BUCKET, PROCESSED_KEY))
 
 def run_process():
@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("google.generativeai")
+pytest.importorskip("faiss")
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from src.RAG import agentG
+
+
+def test_run_agent_twice_in_one_process(monkeypatch):
+    loops = set()
+
+    async def fake_gemini(prompt, model_name="gemini-2.0-flash"):
+        # genai's gRPC-aio client is bound to the first loop it runs on
+        loops.add(asyncio.get_running_loop())
+        return "ok"
+
+    monkeypatch.setattr(agentG, "gemini_response", fake_gemini)
+    monkeypatch.setattr(agentG, "_retrieve", lambda rag, query: [{"snippet": "P1 | Camden"}])
+
+    first = agentG.run_agent("2 bed in Camden", rag=None)
+    second = agentG.run_agent("cheap flat in Hackney", rag=None)
+
+    assert first["answer"] == second["answer"] == "ok"
+    assert len(loops) == 1
@@ -0,0 +1,48 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("boto3")
+
+from src.process import parse_price, parse_prices
+
+PRICES = [
+    "£450,000",
+    "450000",
+    " £1,250,000 ",
+    "450k",
+    "450K",
+    "1.5k",
+    "£2.25k",
+    "  300000\t",
+    "1e6",
+    "inf",
+    "-inf",
+    "nan",
+    "",
+    "abc",
+    "k",
+    "12.7",
+    None,
+    float("nan"),
+    450000,
+    450000.9,
+    -1200,
+]
+
+
+@pytest.mark.parametrize("price", PRICES)
+def test_parse_prices_matches_parse_price(price):
+    expected = parse_price(price)
+    got = parse_prices(pd.Series([price], dtype=object)).iloc[0]
+    if expected is None:
+        assert pd.isna(got)
+    else:
+        assert got == expected
+
+
+def test_parse_prices_keeps_index_and_order():
+    s = pd.Series(["£1,000", "2k", None], index=[10, 20, 30])
+    out = parse_prices(s)
+    assert out.index.tolist() == [10, 20, 30]
+    assert out.iloc[:2].tolist() == [1000, 2000]
+    assert pd.isna(out.iloc[2])
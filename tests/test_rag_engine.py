@@ -0,0 +1,87 @@
+import hashlib
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from src.RAG import rag_engine
+from src.RAG.rag_engine import RAGStore
+
+DIM = 16
+
+
+class StubEncoder:
+    """Deterministic per-text unit vectors, so distinct questions never hit the cache."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_sentence_embedding_dimension(self):
+        return DIM
+
+    def encode(self, texts, **kwargs):
+        out = np.empty((len(texts), DIM), dtype=np.float32)
+        for i, t in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(t.encode()).digest()[:4], "little")
+            out[i] = np.random.default_rng(seed).standard_normal(DIM)
+        return out
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(rag_engine, "SentenceTransformer", StubEncoder)
+    rag = RAGStore()
+    emb = rag.model.encode([f"doc {i}" for i in range(100)])
+    faiss.normalize_L2(emb)
+    rag.index = faiss.IndexFlatL2(DIM)
+    rag.index.add(emb)
+    rag.texts = np.array([f"doc {i}" for i in range(100)], dtype=object)
+    rag._pids = np.array([f"P{i}" for i in range(100)], dtype=str)
+    return rag
+
+
+def test_query_cache_survives_concurrent_eviction(store, monkeypatch):
+    monkeypatch.setattr(rag_engine, "QUERY_CACHE_SIZE", 1024)
+    questions = [f"question {i}" for i in range(1600)]
+    # force frequent thread switches so lookup/insert/evict interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda q: store.query(q, k=3), questions))
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert all(len(r) == 3 for r in results)
+    assert len(store._qcache_results) == 1024
+    assert store._qcache_index.ntotal == 1024
+    # repeat questions still get their own results back
+    for q, r in zip(questions[:50], results[:50]):
+        assert store.query(q, k=3) == r
+
+
+def test_build_index_renders_missing_values_as_nan(store):
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({
+        "property_id": ["P1", "P2"],
+        "address": ["1 High St", None],
+        "borough": pd.Series(["Camden", None], dtype="category"),
+        "bedrooms": [2, 3],
+        "price": [500000.0, float("nan")],
+    })
+
+    assert store.build_index(df) == {"count": 2}
+    assert store.texts.tolist() == [
+        "P1 | 1 High St | Camden | 2 bed | £500000.0",
+        "P2 | nan | nan | 3 bed | £nan",
+    ]
+
+
+def test_query_batch_with_no_questions(store):
+    assert store.query_batch([]) == []